@@ -1,48 +1,234 @@
 """PinUp - Update Pinned Package Versions in Containerfiles."""
 
+from __future__ import annotations
+
+import atexit
+import contextlib
+import functools
 import logging
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-import docker
-
-from pinup.models import PackageManager
 from pinup.utils.get_socket import get_container_runtime_socket
 from pinup.utils.parsers.args import parse_args
 from pinup.utils.parsers.containerfiles import ContainerfileParser
 from pinup.utils.parsers.package_manager import get_package_manager
 from pinup.utils.update_containerfile import containerfile_diff, update_containerfile
 
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    # docker pulls in requests and urllib3, so it is only imported when used
+    import docker
+    from docker.models.containers import Container
+
+    from pinup.models import BuildStage, PackageManager
+
 logger = logging.getLogger(__name__)
 
+# Matches pinned DNF packages ("name-version"), capturing the package name
+# _DNF_PIN_RE = re.compile(r"([a-zA-Z0-9_-]+)-[\d.:]+(?=-*\d*\s|$)")
+_DNF_PIN_RE = re.compile(r"([a-zA-Z0-9_-]+)-[0-9]\S+")
+
+# Pinned package pattern for each supported package manager
+_PIN_PATTERNS = {
+    "dnf": _DNF_PIN_RE,
+}
+
+# Maximum number of stages checked concurrently
+_MAX_WORKERS = 8
+
+# Seconds a query container lives before it exits and is removed by the
+# runtime, so containers left behind by a killed run do not pile up
+_QUERY_CONTAINER_LIFETIME = 3600
+
+# Long-lived containers used to run package queries, keyed by base image
+_query_containers: dict[str, Container] = {}
+# Package query results, keyed by base image and queried packages
+_query_results: dict[tuple[str, tuple[str, ...]], dict[str, str]] = {}
+# Per-image locks so concurrent stages never start duplicate containers or
+# repeat a query that another stage is already running
+_image_locks: dict[str, threading.RLock] = {}
+_image_locks_guard = threading.Lock()
+
+
+def _image_lock(image: str) -> threading.RLock:
+    """Return the lock guarding the query container and results for an image."""
+    with _image_locks_guard:
+        return _image_locks.setdefault(image, threading.RLock())
+
+
+def get_cache_volumes(
+    image: str,
+    pkg_manager: PackageManager,
+) -> dict[str, dict[str, str]]:
+    """Return named volumes persisting the package manager caches for an image.
+
+    The runtime creates and owns the volumes, so no root-owned files end up on
+    the host and they can be removed with "docker volume rm".
+
+    Args:
+        image: Base image the caches belong to
+        pkg_manager: PackageManager object for the image
+
+    """
+    # Volume names only allow [a-zA-Z0-9_.-]
+    image_name = re.sub(r"[^\w.-]", "_", image, flags=re.ASCII)
+    prefix = f"pinup-{pkg_manager.package_manager}-{image_name}"
+
+    return {
+        f"{prefix}-{Path(cache_dir).name}": {"bind": cache_dir, "mode": "rw"}
+        for cache_dir in pkg_manager.cache_dirs
+    }
+
+
+def get_query_container(
+    client: docker.DockerClient,
+    image: str,
+    pkg_manager: PackageManager,
+) -> Container:
+    """Return a running container for the image, starting one if needed.
+
+    Args:
+        client: Docker client object
+        image: Base image to run the container from
+        pkg_manager: PackageManager object for the image
+
+    """
+    with _image_lock(image):
+        container = _query_containers.get(image)
+        if container is None:
+            container = client.containers.run(
+                image=image,
+                command=["sleep", str(_QUERY_CONTAINER_LIFETIME)],
+                detach=True,
+                auto_remove=True,
+                labels={"pinup": "query"},
+                volumes=get_cache_volumes(image, pkg_manager),
+            )
+            _query_containers[image] = container
+    return container
+
+
+@atexit.register
+def remove_query_containers() -> None:
+    """Kill and remove all long-lived query containers."""
+    if not _query_containers:
+        return
+
+    from docker.errors import APIError  # noqa: PLC0415
+
+    for container in _query_containers.values():
+        with contextlib.suppress(APIError):
+            container.remove(force=True)
+    _query_containers.clear()
+
+
+def run_package_query(
+    client: docker.DockerClient,
+    image: str,
+    pkg_manager: PackageManager,
+    packages: tuple[str, ...],
+) -> dict[str, str]:
+    """Run a package query in the query container for an image.
+
+    Results are cached, so stages sharing a base image and pinned packages
+    only run the query once.
+
+    Args:
+        client: Docker client object
+        image: Base image to run the query in
+        pkg_manager: PackageManager object for the image
+        packages: Sorted names of the packages being queried
+
+    Returns:
+        New version of each package, keyed by package name
+
+    """
+    key = (image, packages)
+    with _image_lock(image):
+        if key not in _query_results:
+            container = get_query_container(client, image, pkg_manager)
+
+            command = " ".join((pkg_manager.check_update_command, *packages))
+
+            # TODO: Add timeout handling
+            # exec_run does not report the exit code of a streamed command, so
+            # use the low-level API and inspect the exec once output ends
+            exec_id = client.api.exec_create(container.id, command)["Id"]
+            output = client.api.exec_start(exec_id, stream=True)
+
+            # Parse the "name=version" output line by line as it arrives
+            versions = {}
+            for line in iter_lines(output):
+                name, sep, version = line.partition("=")
+                if sep:
+                    versions[name] = version
+
+            exit_code = client.api.exec_inspect(exec_id)["ExitCode"]
+            if exit_code != 0:
+                # Partial results are not cached, so a later stage retries
+                logger.warning(
+                    "Package query in %s exited with code %s",
+                    image,
+                    exit_code,
+                )
+                return versions
+            _query_results[key] = versions
+
+        return _query_results[key]
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Yield the non-empty lines of a stream of output chunks.
+
+    Args:
+        chunks: Raw output chunks, which may split lines at any point
+
+    """
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if text := line.decode("utf-8", errors="replace").strip():
+                yield text
+
+    if text := buffer.decode("utf-8", errors="replace").strip():
+        yield text
+
 
 def get_new_package_versions(
+    stage: BuildStage,
     stage_content: str,
     pkg_manager: PackageManager,
     client: docker.DockerClient,
-) -> tuple[str, list[str]] | None:
+) -> tuple[re.Pattern[str], dict[str, str]] | None:
     """Update package versions in a container stage.
 
     Args:
+        stage: BuildStage being processed
         stage_content: Content of the container stage
         pkg_manager: PackageManager object for this stage
         client: Docker client object
 
     """
-    packages = []
-    pattern = ""
-    command = ""
-
-    # NOTE: This is a placeholder implementation for DNF package manager
-    result = ""
-
-    if pkg_manager.package_manager == "dnf":
-        # pattern = r"([a-zA-Z0-9_-]+)-[\d.:]+(?=-*\d*\s|$)"
-        pattern = r"([a-zA-Z0-9_-]+)-[0-9]\S+"
-
-        # Matches package names
-        packages = {match.group(1) for match in re.finditer(pattern, stage_content)}
+    from docker.errors import APIError  # noqa: PLC0415
+
+    pattern = _PIN_PATTERNS.get(pkg_manager.package_manager)
+    if pattern is None:
+        logger.info(
+            "Package manager %s is not supported yet",
+            pkg_manager.package_manager,
+        )
+        return None
 
-        command = f"{pkg_manager.check_update_command} {' '.join(packages)}"
+    # Matches package names, sorted so the same pins always produce the same
+    # query command and cache key
+    packages = tuple(sorted(set(pattern.findall(stage_content))))
 
     if not packages:
         logger.info("No pinned packages found in stage %d", stage.index)
@@ -50,41 +236,67 @@ def get_new_package_versions(
 
     logger.info("Pinned packages in stage %d: %s", stage.index, packages)
 
-    if command:
-        try:
-            # TODO: Create temp dir to store package manager cache and pass as volume
-            container = client.containers.run(
-                image=stage.base_image,
-                command=command,
-                detach=True,
-            )
+    try:
+        new_package_versions = run_package_query(
+            client=client,
+            image=stage.base_image,
+            pkg_manager=pkg_manager,
+            packages=packages,
+        )
+
+    except APIError:
+        logger.exception("Error checking for updates: %s")
+        raise
 
-            # TODO: Add timeout handling
-            # Wait for the container to finish
-            container.wait()
+    logger.info(
+        "New package versions in stage %d: %s",
+        stage.index,
+        new_package_versions,
+    )
 
-            # Get the output from the container
-            result = container.logs().decode("utf-8").strip()
+    # TODO: Return some kind of object with package name and version
+    return pattern, new_package_versions
 
-            # Clean up the container
-            container.remove()
 
-            logger.info("Result:\n%s", result)
+def check_stage(
+    parser: ContainerfileParser,
+    stage: BuildStage,
+    client: docker.DockerClient,
+) -> tuple[str, tuple[re.Pattern[str], dict[str, str]] | None]:
+    """Check a build stage for pinned package updates.
 
-        except docker.errors.APIError:
-            logger.exception("Error checking for updates: %s")
-            raise
+    Args:
+        parser: ContainerfileParser for the containerfile
+        stage: BuildStage to check
+        client: Docker client object
 
-    new_package_versions = result.strip().split("\n")
+    Returns:
+        The stage content and the result of get_new_package_versions
 
+    """
     logger.info(
-        "New package versions in stage %d: %s",
+        "Stage %d (%s) using base image: %s",
         stage.index,
-        new_package_versions,
+        stage.name or "unnamed",
+        stage.base_image,
     )
 
-    # TODO: Return some kind of object with package name and version
-    return pattern, new_package_versions
+    parsed_stage = parser.stage(stage=stage)
+
+    logger.debug("Stage content:\n%s", parsed_stage)
+
+    # Determine package manager for this stage
+    pkg_manager = get_package_manager(stage.base_image)
+    logger.info("Stage uses package manager: %s", pkg_manager.package_manager)
+
+    new_packages = get_new_package_versions(
+        stage=stage,
+        stage_content=parsed_stage,
+        pkg_manager=pkg_manager,
+        client=client,
+    )
+
+    return parsed_stage, new_packages
 
 
 if __name__ == "__main__":
@@ -98,6 +310,8 @@ if __name__ == "__main__":
     socket = get_container_runtime_socket() if not args.socket else args.socket
     logger.info("Using container runtime socket: %s", socket)
 
+    import docker
+
     # Initialize Docker client only once
     client = docker.DockerClient(base_url=socket)
 
@@ -109,52 +323,42 @@ if __name__ == "__main__":
         stages = parse.containerfile()
         logger.info("Found %d build stages", len(stages))
 
-        for stage in stages:
-            logger.info(
-                "Stage %d (%s) using base image: %s",
-                stage.index,
-                stage.name or "unnamed",
-                stage.base_image,
-            )
-
-            parsed_stage = parse.stage(
-                stage=stage,
-                all_stages=stages,
+        # Stages are independent, so query them concurrently
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(_MAX_WORKERS, len(stages))),
+        ) as executor:
+            results = list(
+                executor.map(
+                    functools.partial(check_stage, parse, client=client),
+                    stages,
+                ),
             )
 
-            logger.info("Stage content:\n%s", parsed_stage)
-
-            # Determine package manager for this stage
-            pkg_manager = get_package_manager(stage.base_image)
-            logger.info("Stage uses package manager: %s", pkg_manager.package_manager)
+        # Apply updates sequentially so prompts never interleave
+        updates = []
+        for stage, (parsed_stage, new_packages) in zip(stages, results, strict=True):
+            if not new_packages:
+                continue
 
-            # Process this stage
-            new_packages = get_new_package_versions(
-                stage_content=parsed_stage,
-                pkg_manager=pkg_manager,
-                client=client,
+            new_content = update_containerfile(
+                pattern=new_packages[0],
+                packages=new_packages[1],
+                content=parsed_stage,
             )
-
-            if not new_packages:
-                break
-            else:
-                new_content = update_containerfile(
-                    pattern=new_packages[0],
-                    packages=new_packages[1],
-                    content=parsed_stage,
-                )
-            if new_content:
-                if not args.no_prompt:
-                    containerfile_diff(
-                        content=parsed_stage,
-                        updated_content=new_content,
-                        file_path=args.file,
-                    )
-                else:
-                    file_content = args.file.read_text()
-                    updated_content = file_content.replace(parsed_stage, new_content)
-                    args.file.write_text(updated_content)
-                    logger.info("Updated containerfile %s:\n%s", args.file, new_content)
+            if new_content == parsed_stage:
+                continue
+
+            if args.no_prompt or containerfile_diff(
+                content=parsed_stage,
+                updated_content=new_content,
+                file_path=args.file,
+            ):
+                updates.append((stage, new_content))
+
+        # Write all accepted updates at once
+        if updates:
+            args.file.write_text(parse.replace_stages(updates))
+            logger.info("Updated containerfile %s", args.file)
 
     except FileNotFoundError:
         logger.exception("Container file not found: %s", args.file)
@@ -3,7 +3,7 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class BuildStage:
     """Represents a build stage in a containerfile."""
 
@@ -11,11 +11,13 @@ class BuildStage:
     name: str | None  # Name after AS directive, if any
     base_image: str  # Base image for this stage
     start_line: int  # Line number where this stage begins
+    end_line: int | None = None  # Last line of this stage, None if it runs to EOF
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class PackageManager:
     """Represents a package manager for a specific base image."""
 
     package_manager: str  # Package manager for this base image
     check_update_command: str  # Command to check for package updates
+    cache_dirs: tuple[str, ...] = ()  # Metadata cache directories in the image
@@ -1,28 +1,49 @@
 """Get the path to the container runtime socket."""
 
+import functools
 import os
-import shutil
+import re
 from pathlib import Path
 
+_UID = os.getuid()
 
+# Well-known runtime sockets, rootless user sockets preferred over rootful ones
+_SOCKETS = (
+    f"/run/user/{_UID}/docker.sock",
+    "/var/run/docker.sock",
+    f"/run/user/{_UID}/podman/podman.sock",
+    "/var/run/podman/podman.sock",
+)
+
+# Active UNIX sockets, one per line with the bound path in the last column
+_PROC_NET_UNIX = Path("/proc/net/unix")
+_RUNTIME_SOCKET_RE = re.compile(r" (/\S*/(?:docker|podman)\.sock)$", re.MULTILINE)
+
+
+def find_listening_socket() -> str | None:
+    """Return the path of an accessible runtime socket from /proc/net/unix."""
+    try:
+        sockets = _PROC_NET_UNIX.read_text()
+    except OSError:
+        return None
+
+    for match in _RUNTIME_SOCKET_RE.finditer(sockets):
+        path = match.group(1)
+        if os.access(path, os.R_OK | os.W_OK):
+            return path
+    return None
+
+
+@functools.cache
 def get_container_runtime_socket() -> str | None:
     """Return the path to the container runtime socket."""
-    for runtime in ("docker", "podman"):
-        if path := shutil.which(runtime):
-            uid = os.getuid()
-
-            if "docker" in path:
-                # Try rootless user socket first
-                if Path(f"/run/user/{uid}/docker.sock").exists():
-                    return f"unix://run/user/{uid}/docker.sock"
-                # Try rootful socket next
-                if Path("/var/run/docker.sock").exists():
-                    return "unix://var/run/docker.sock"
-            if "podman" in path:
-                if Path(f"/run/user/{uid}/podman/podman.sock").exists():
-                    return f"unix://run/user/{uid}/podman/podman.sock"
-                if Path("/var/run/podman/podman.sock").exists():
-                    return "unix://var/run/podman/podman.sock"
+    for path in _SOCKETS:
+        if os.access(path, os.R_OK | os.W_OK):
+            return f"unix://{path}"
+
+    # Fall back to sockets in non-standard locations
+    if path := find_listening_socket():
+        return f"unix://{path}"
 
     msg = "No container runtime socket found"
     raise FileNotFoundError(msg)
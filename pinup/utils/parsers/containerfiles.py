@@ -1,9 +1,36 @@
 """Parser Utils for Pinup."""
 
+import dataclasses
+import re
 from pathlib import Path
 
 from pinup.models import BuildStage
 
+# Whitespace within an instruction, including escaped line continuations,
+# which may have trailing whitespace after the backslash
+_WS = r"(?:[ \t]|\\[ \t]*\n)+"
+
+# FROM instructions, capturing the base image and the optional stage name
+_FROM_RE = re.compile(
+    rf"^[ \t]*FROM{_WS}(?:--platform=[^\s\\]+{_WS})?(?P<image>[^\s\\]+)"
+    rf"(?:{_WS}AS{_WS}(?P<name>[^\s\\]+))?",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def _is_continuation(content: str, position: int) -> bool:
+    """Return whether the line at position continues the previous line.
+
+    Args:
+        content: Containerfile content
+        position: Offset of the start of a line in content
+
+    """
+    if position == 0:
+        return False
+    previous_line = content[content.rfind("\n", 0, position - 1) + 1 : position - 1]
+    return previous_line.rstrip(" \t").endswith("\\")
+
 
 class ContainerfileParser:
     """Parser for Containerfiles/Dockerfiles."""
@@ -17,35 +44,26 @@ class ContainerfileParser:
         """
         self.containerfile_path = containerfile_path
         self.containerfile_content = self.containerfile_path.read_text()
+        self._lines = self.containerfile_content.splitlines(keepends=True)
 
-    def stage(
-        self,
-        stage: BuildStage,
-        all_stages: list[BuildStage],
-    ) -> str:
+    def stage(self, stage: BuildStage) -> str:
         """Parse the container stage content from the containerfile."""
-        # Determine the end line for the current stage
-        current_index = stage.index
-        end_line = None
+        return "".join(self._lines[stage.start_line - 1 : stage.end_line])
+
+    def replace_stages(self, updates: list[tuple[BuildStage, str]]) -> str:
+        """Return the containerfile content with the given stages replaced.
 
-        # Find the next stage's start line to use as our end boundary
-        for other_stage in all_stages:
-            if other_stage.index == current_index + 1:
-                end_line = other_stage.start_line - 1
-                break
+        Args:
+            updates: Stages paired with their new content, in stage order
 
-        # Read the containerfile content
-        with self.containerfile_path.open() as f:
-            all_lines = f.readlines()
+        """
+        lines = list(self._lines)
 
-        # Extract only the portion for the current stage
-        if end_line:
-            stage_content = "".join(all_lines[stage.start_line - 1 : end_line])
-        else:
-            # If this is the last stage, read until the end of file
-            stage_content = "".join(all_lines[stage.start_line - 1 :])
+        # Splice from the last stage back so earlier line numbers stay valid
+        for stage, content in reversed(updates):
+            lines[stage.start_line - 1 : stage.end_line] = [content]
 
-        return stage_content
+        return "".join(lines)
 
     def containerfile(self) -> list[BuildStage]:
         """Parse a container file into build stages.
@@ -65,66 +83,32 @@ class ContainerfileParser:
 
         """
         stages = []
-        current_line = ""
-        line_number = 0
-        stage_count = 0
-
-        with self.containerfile_path.open() as f:
-            for line in f:
-                line_number += 1
-                # Handle line continuations
-                line = line.strip()
-                if line.endswith("\\"):
-                    current_line += line[:-1].strip() + " "
-                    continue
-                else:
-                    current_line += line
-
-                # Remove comments (preserving # in image tags)
-                line_without_comments = ""
-                in_image_tag = False
-                for i, char in enumerate(current_line):
-                    if char == "#" and i > 0 and current_line[i - 1] != ":":
-                        break
-                    if (
-                        char == "/"
-                        and i < len(current_line) - 1
-                        and current_line[i + 1] == "/"
-                    ):
-                        break
-                    if char == ":":
-                        in_image_tag = True
-                    if char == " ":
-                        in_image_tag = False
-                    line_without_comments += char
-
-                parts = line_without_comments.split()
-                if not parts:
-                    current_line = ""
-                    continue
-
-                if parts[0].lower() == "from":
-                    if len(parts) >= 2:
-                        image = parts[1]
-                        stage_name = None
-
-                        # Check for AS clause
-                        remaining_parts = [p.lower() for p in parts[2:]]
-                        if "as" in remaining_parts:
-                            as_index = remaining_parts.index("as") + 2
-                            stage_name = parts[as_index]
-                            # Everything between FROM and AS is the image name
-                            image = " ".join(parts[1:as_index])
-
-                        stage = BuildStage(
-                            index=stage_count,
-                            name=stage_name,
-                            base_image=image,
-                            start_line=line_number,
-                        )
-                        stages.append(stage)
-                        stage_count += 1
-
-                current_line = ""
+        line_number = 1
+        position = 0
+
+        for match in _FROM_RE.finditer(self.containerfile_content):
+            # Skip lines that continue a previous instruction
+            if _is_continuation(self.containerfile_content, match.start()):
+                continue
+
+            # Count lines incrementally from the previous FROM
+            line_number += self.containerfile_content.count(
+                "\n",
+                position,
+                match.start(),
+            )
+            position = match.start()
+
+            # The previous stage ends on the line before this FROM
+            if stages:
+                stages[-1] = dataclasses.replace(stages[-1], end_line=line_number - 1)
+
+            stage = BuildStage(
+                index=len(stages),
+                name=match.group("name"),
+                base_image=match.group("image"),
+                start_line=line_number,
+            )
+            stages.append(stage)
 
         return stages
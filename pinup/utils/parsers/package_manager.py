@@ -1,20 +1,34 @@
 """Module for determining the package manager based on the base image."""
 
+import functools
+import re
+
 from pinup.models import PackageManager
 
+_DNF = PackageManager(
+    package_manager="dnf",
+    check_update_command="dnf repoquery --quiet --latest-limit=1 --queryformat='%{name}=%{version}\n'",
+    # dnf4 and dnf5 respectively
+    cache_dirs=("/var/cache/dnf", "/var/cache/libdnf5"),
+)
+
+# Package manager used by each supported distro. apt-get (Ubuntu, Debian) and
+# apk (Alpine) are not supported yet.
+_DISTRO_PACKAGE_MANAGERS = {
+    "fedora": _DNF,
+    "centos": _DNF,
+    "rhel": _DNF,
+}
+
+# Finds any supported distro name in a single scan of the image name
+_DISTRO_RE = re.compile("|".join(map(re.escape, _DISTRO_PACKAGE_MANAGERS)))
+
 
+@functools.lru_cache(maxsize=64)
 def get_package_manager(base_image: str) -> PackageManager:
     """Determine the package manager based on the base image."""
-    image_lower = base_image.lower()
-    if any(distro in image_lower for distro in ["fedora", "centos", "rhel"]):
-        return PackageManager(
-            package_manager="dnf",
-            check_update_command="dnf repoquery --quiet --latest-limit=1 --queryformat='%{name}=%{version}\n'",
-        )
-    # if any(distro in image_lower for distro in ["ubuntu", "debian"]):
-    #     return PackageManager(package_manager="apt-get", check_update_command="update")
-    # if "alpine" in image_lower:
-    #     return PackageManager(package_manager="apk", check_update_command="update")
+    if match := _DISTRO_RE.search(base_image.lower()):
+        return _DISTRO_PACKAGE_MANAGERS[match.group(0)]
 
     msg = f"Unknown base image type: {base_image}, cannot determine package manager"
     raise RuntimeError(msg)
@@ -1,46 +1,76 @@
 """Update the containerfile with new package versions."""
 
 import difflib
+import functools
 import logging
 import re
-import sys
+from collections.abc import Mapping
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
+
+
+@functools.lru_cache(maxsize=64)
+def _get_pattern(pattern: str) -> re.Pattern[str]:
+    """Compile a regex pattern string, reusing earlier compilations."""
+    return re.compile(pattern)
 
 
 def update_containerfile(
-    pattern: str,
-    packages: list,
+    pattern: str | re.Pattern[str],
+    packages: list[str] | Mapping[str, str],
     content: str,
 ) -> str:
     """Update the containerfile with new package versions.
 
     Args:
-        pattern: Regex pattern to match package versions
-        packages: List of packages with new versions
+        pattern: Regex pattern, or compiled pattern, to match package versions
+        packages: New version of each package, or a list of "name=version"
         content: current stage being processed
 
     """
-    updated_content = content
+    if not packages:
+        return content
+
+    # Map each package name to its new version
+    if isinstance(packages, Mapping):
+        versions = packages
+    else:
+        versions = {
+            name: version
+            for name, sep, version in (pkg.partition("=") for pkg in packages)
+            if sep
+        }
+
+    # Nothing can change, so skip scanning and copying the content
+    if not versions:
+        return content
+
+    compiled = pattern if isinstance(pattern, re.Pattern) else _get_pattern(pattern)
+
+    # Build each replacement once, however often the package is pinned
+    # NOTE: Different distros may require different version strings
+    # tested and working on Fedora, 'package-version'
+    replacements = {name: f"{name}-{version}" for name, version in versions.items()}
+
+    # Checked once here rather than by every debug call in the callback
+    log_debug = logger.isEnabledFor(logging.DEBUG)
 
-    for match in re.finditer(pattern, content):
-        logger.info("Found match: %s", match.group(0))
+    def replace(match: re.Match[str]) -> str:
+        if log_debug:
+            logger.debug("Found match: %s", match.group(0))
         package_name = match.group(1)
 
-        for pkg in packages:
-            if pkg.startswith(f"{package_name}"):
-                new_version = pkg.split("=")[1]
-                old_version = match.group(0)
-                updated_content = updated_content.replace(
-                    old_version,
-                    # NOTE: Different distros may require different version strings
-                    # tested and working on Fedora, 'package-version'
-                    f"{package_name}-{new_version}",
-                )
-                logger.info("updating %s to %s", package_name, new_version)
-    logger.info("Updated content:\n%s", updated_content)
+        replacement = replacements.get(package_name)
+        if replacement is None:
+            return match.group(0)
+
+        logger.info("updating %s to %s", package_name, versions[package_name])
+        return replacement
+
+    updated_content = compiled.sub(replace, content)
+    if log_debug:
+        logger.debug("Updated content:\n%s", updated_content)
 
     return updated_content
 
@@ -49,21 +79,29 @@ def containerfile_diff(
     content: str,
     updated_content: str,
     file_path: Path,
-) -> None:
-    """Generate a diff between the old and new Containerfile."""
-    if updated_content != content:
-        diff = "\n".join(
-            difflib.unified_diff(
-                content.splitlines(),
-                updated_content.splitlines(),
-                fromfile=f"{file_path} (old)",
-                tofile=f"{file_path} (new)",
-            ),
-        )
-        logger.info("\n%s", diff)
-        response = input(f"Update {file_path}? (y/N): ").strip().lower()
-        if response != "y":
-            logger.info("Skipping update for %s", file_path)
-            return
-        file_path.write_text(updated_content)
-        logger.info("Updated %s: ", file_path)
+) -> bool:
+    """Show a diff between the old and new stage and prompt to apply it.
+
+    Returns:
+        True if the user accepted the update
+
+    """
+    if updated_content == content:
+        return False
+
+    # Show the diff with the prompt, whatever the log level, so the user can
+    # see what they are accepting
+    diff = "\n".join(
+        difflib.unified_diff(
+            content.splitlines(),
+            updated_content.splitlines(),
+            fromfile=f"{file_path} (old)",
+            tofile=f"{file_path} (new)",
+            lineterm="",
+        ),
+    )
+    response = input(f"{diff}\nUpdate {file_path}? (y/N): ").strip().lower()
+    if response != "y":
+        logger.info("Skipping update for %s", file_path)
+        return False
+    return True
@@ -0,0 +1,117 @@
+"""Tests for pinup.utils.parsers.containerfiles."""
+
+from pathlib import Path
+
+import pytest
+
+from pinup.models import BuildStage
+from pinup.utils.parsers.containerfiles import ContainerfileParser
+
+
+def _parse(tmp_path: Path, content: str) -> ContainerfileParser:
+    """Return a parser for a containerfile with the given content."""
+    path = tmp_path / "Containerfile"
+    path.write_text(content)
+    return ContainerfileParser(containerfile_path=path)
+
+
+def test_named_and_unnamed_stages(tmp_path: Path) -> None:
+    """Stages record their name, base image and line range."""
+    parser = _parse(
+        tmp_path,
+        "FROM fedora:40 AS builder\n"
+        "RUN dnf install -y gcc-14.1.1\n"
+        "\n"
+        "from fedora:40\n"
+        "COPY --from=builder /out /out\n",
+    )
+
+    assert parser.containerfile() == [
+        BuildStage(
+            index=0,
+            name="builder",
+            base_image="fedora:40",
+            start_line=1,
+            end_line=3,
+        ),
+        BuildStage(index=1, name=None, base_image="fedora:40", start_line=4),
+    ]
+
+
+def test_platform_flag(tmp_path: Path) -> None:
+    """--platform is skipped when reading the base image."""
+    parser = _parse(tmp_path, "FROM --platform=linux/amd64 fedora:40 AS build\n")
+
+    [stage] = parser.containerfile()
+    assert stage.base_image == "fedora:40"
+    assert stage.name == "build"
+
+
+def test_multiline_from(tmp_path: Path) -> None:
+    """A FROM split over lines starts on its first line."""
+    parser = _parse(
+        tmp_path,
+        "FROM fedora:40\n"
+        "RUN true\n"
+        "FROM \\\n"
+        "    centos:9 \\  \n"
+        "    AS final\n"
+        "RUN true\n",
+    )
+
+    stages = parser.containerfile()
+    assert [stage.start_line for stage in stages] == [1, 3]
+    assert [stage.end_line for stage in stages] == [2, None]
+    assert stages[1].base_image == "centos:9"
+    assert stages[1].name == "final"
+
+
+@pytest.mark.parametrize(
+    "continuation",
+    ["\\\n", "\\ \n", "\\\t \n"],
+    ids=["bare", "trailing-space", "trailing-tab"],
+)
+def test_from_in_continued_run(tmp_path: Path, continuation: str) -> None:
+    """A line continuing a RUN is never read as a FROM."""
+    parser = _parse(
+        tmp_path,
+        f"FROM fedora:40\nRUN python3 -c {continuation}from x import y\n"
+        f"RUN echo {continuation}FROM x\n",
+    )
+
+    [stage] = parser.containerfile()
+    assert stage.base_image == "fedora:40"
+    assert stage.end_line is None
+
+
+def test_stage_and_replace_stages(tmp_path: Path) -> None:
+    """Stages are read and replaced by line range."""
+    parser = _parse(
+        tmp_path,
+        "# syntax=docker/dockerfile:1\n"
+        "FROM fedora:40 AS a\n"
+        "RUN dnf install -y bash-5.2.26\n"
+        "FROM fedora:40 AS b\n"
+        "RUN dnf install -y curl-8.6.0\n"
+        "FROM fedora:40 AS c\n"
+        "RUN dnf install -y vim-9.1\n",
+    )
+    first, second, third = parser.containerfile()
+
+    assert parser.stage(second) == (
+        "FROM fedora:40 AS b\nRUN dnf install -y curl-8.6.0\n"
+    )
+    assert parser.replace_stages(
+        [
+            (first, "FROM fedora:40 AS a\nRUN dnf install -y bash-5.2.32\n"),
+            (third, "FROM fedora:40 AS c\nRUN dnf install -y vim-9.1.2\n"),
+        ],
+    ) == (
+        "# syntax=docker/dockerfile:1\n"
+        "FROM fedora:40 AS a\n"
+        "RUN dnf install -y bash-5.2.32\n"
+        "FROM fedora:40 AS b\n"
+        "RUN dnf install -y curl-8.6.0\n"
+        "FROM fedora:40 AS c\n"
+        "RUN dnf install -y vim-9.1.2\n"
+    )
@@ -0,0 +1,14 @@
+"""Tests for pinup.main."""
+
+from pinup.main import iter_lines
+
+
+def test_iter_lines_joins_split_chunks() -> None:
+    """Lines split across chunks are reassembled."""
+    chunks = [b"bash=5.", b"2.26\ncurl=8.6", b".0\n", b"\n", b"vim=9.1"]
+    assert list(iter_lines(chunks)) == ["bash=5.2.26", "curl=8.6.0", "vim=9.1"]
+
+
+def test_iter_lines_replaces_invalid_utf8() -> None:
+    """Invalid UTF-8 does not abort the stream."""
+    assert list(iter_lines([b"bad=\xff\n"])) == ["bad=�"]
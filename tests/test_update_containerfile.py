@@ -0,0 +1,60 @@
+"""Tests for pinup.utils.update_containerfile."""
+
+import logging
+from pathlib import Path
+
+import pytest
+
+from pinup.main import _DNF_PIN_RE
+from pinup.utils.update_containerfile import containerfile_diff, update_containerfile
+
+
+def test_rewrites_pinned_versions() -> None:
+    """Every pin of an updated package is rewritten."""
+    content = (
+        "RUN dnf install -y bash-5.2.26 curl-8.6.0\nRUN dnf reinstall bash-5.2.26\n"
+    )
+
+    assert update_containerfile(_DNF_PIN_RE, {"bash": "5.2.32"}, content) == (
+        "RUN dnf install -y bash-5.2.32 curl-8.6.0\nRUN dnf reinstall bash-5.2.32\n"
+    )
+
+
+def test_does_not_rewrite_package_prefixes() -> None:
+    """A package whose name extends an updated one is left alone."""
+    content = "RUN dnf install -y python3-3.12.1 python3-libs-3.12.1\n"
+
+    assert update_containerfile(_DNF_PIN_RE, {"python3": "3.12.4"}, content) == (
+        "RUN dnf install -y python3-3.12.4 python3-libs-3.12.1\n"
+    )
+
+
+def test_accepts_name_version_list() -> None:
+    """Packages may be given as "name=version" strings."""
+    content = "RUN dnf install -y vim-9.1\n"
+
+    assert update_containerfile(_DNF_PIN_RE.pattern, ["vim=9.1.2"], content) == (
+        "RUN dnf install -y vim-9.1.2\n"
+    )
+
+
+def test_no_versions_returns_content() -> None:
+    """Nothing is rewritten without new versions."""
+    content = "RUN dnf install -y vim-9.1\n"
+
+    assert update_containerfile(_DNF_PIN_RE, [], content) is content
+    assert update_containerfile(_DNF_PIN_RE, ["malformed"], content) is content
+
+
+def test_diff_shown_at_default_log_level(
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """The prompt includes the diff even when INFO logs are hidden."""
+    prompts = []
+    monkeypatch.setattr("builtins.input", lambda prompt: prompts.append(prompt) or "y")
+    caplog.set_level(logging.WARNING)
+
+    assert containerfile_diff("vim-9.1\n", "vim-9.1.2\n", Path("Containerfile"))
+    [prompt] = prompts
+    assert "-vim-9.1\n+vim-9.1.2\nUpdate Containerfile? (y/N): " in prompt